@@ -1,4 +1,7 @@
-from typing import Set
+import bisect
+import ctypes
+from array import array
+from operator import itemgetter
 
 """
 Design choices:
@@ -19,11 +22,25 @@ High level description of the implementation:
     The manager's state contains these main variables:
     - _buf: the backbone bytebuffer
     - _free_bytes: num of free bytes - simply for fast-checking of available space on alloc() request
-    - _allocated_chunks: set of *active* (not-freed) MemoryChunks, to validate 
-    - _free_slots: array of tuples - (offset, size) - representing sequences of available memory slots in the buffer
+    - _chunk_by_offset: offset -> live chunk table (validity checks use the chunk's own _alive
+        flag - O(1), no hashing). Since allocated bytes are wall-to-wall chunks,
+        defrag can walk each allocated run chunk-by-chunk through this table - no sorting needed
+    - _free_by_class: segregated free lists (jemalloc-style) - dict keyed by size class (power-of-two bucket,
+        i.e. size.bit_length()), each holding (offset, size) tuples of available memory slots in the buffer,
+        sorted by slot size. alloc() only looks at buckets that are big enough and bisects for the smallest
+        fitting slot (best fit), so it no longer degrades linearly with fragmentation.
+    - _free_offsets / _free_sizes: the same slots, kept sorted by offset as parallel arrays of raw
+        64-bit ints (SoA instead of a list of tuples - no per-slot PyObject, ~5x smaller and cache
+        friendly) - used to coalesce adjacent slots on free() and by the defrag process
+    - _quick_free: small LIFO of recently-freed (offset, size) slots, consulted by alloc() before the
+        buckets. Keeps freshly-freed memory cache-hot and makes a free/alloc cycle near-free; it is
+        flushed (with coalescing) into the main free lists when full or before defrag
     
-    Upon calling alloc(), we first make sure there is enough space in the buffer (globally). Then we check if we can 
+    Upon calling alloc(), we first make sure there is enough space in the buffer (globally). Then we check if we can
         find it inside on of the available slots. If not, we run a de-frag process on the entire buffer.
+    Bulk byte work (zeroing, defrag copies) deliberately goes through ctypes memset/memmove rather than a
+        NumPy view over the buffer: glibc's memset/memmove are already SIMD-vectorized, so NumPy would add
+        a dependency (and per-op ufunc dispatch) without moving bytes any faster.
     The MemoryChunk class a simple - almost pojo - wrapper around the offset and size specs. It offloads any function
         to the manager itself.
       
@@ -32,11 +49,21 @@ High level description of the implementation:
 """
 
 
+_slot_size = itemgetter(1)  # sort/bisect key for (offset, size) slots
+
+
 class MemoryChunk:
+    # no per-instance __dict__: chunks are tiny fixed-shape objects created on every alloc, and
+    # slot access is a fixed-offset C load instead of a dict probe on each _offset/_size read
+    __slots__ = ('_offset', '_size', 'manager', '_alive')
+
     def __init__(self, offset, size, manager):
         self._offset = offset
         self._size = size
         self.manager = manager
+        # liveness flag - flipped off by free(). Lets validity checks be a plain attribute read
+        # instead of a set lookup (which hashes the chunk on every read/write).
+        self._alive = True
 
     def free(self):
         self.manager.free(self)
@@ -49,98 +76,271 @@ class MemoryChunk:
 
 
 class MemoryManager:
+    # how many recently-freed slots to keep aside before flushing them into the main free lists
+    _QUICK_FREE_CAP = 64
 
     def __init__(self, size_bytes):
         self._buf = bytearray(size_bytes)
+        # raw pointer into _buf, so hot paths can memset/memmove directly instead of going through
+        # python-level slice assignments (which allocate temporaries). Note: this pins _buf's size.
+        self._buf_ptr = (ctypes.c_ubyte * size_bytes).from_buffer(self._buf)
+        self._buf_addr = ctypes.addressof(self._buf_ptr)
+        # zero-copy window over _buf: slicing a memoryview yields another view, no bytes copied
+        self._mv = memoryview(self._buf)
         self._size = size_bytes
         self._free_bytes = size_bytes
-        self._allocated_chunks: Set[MemoryChunk] = set()
-        self._free_slots = [(0, size_bytes)]
+        self._chunk_by_offset: dict[int, MemoryChunk] = {}
+        # size classes range from bucket 1 (1-byte slots) up to the bucket holding the whole buffer:
+        self._max_class = size_bytes.bit_length()
+        self._free_by_class: dict[int, list[tuple[int, int]]] = {}
+        self._free_offsets = array('Q')
+        self._free_sizes = array('Q')
+        self._quick_free: list[tuple[int, int]] = []
+        self._push_free_slot(0, size_bytes)
+        # per-size-class allocators with the starting bucket constant-folded in, indexed by
+        # size.bit_length() - alloc() dispatches here instead of recomputing the class per call:
+        self._alloc_by_class = [self._make_alloc(cls) for cls in range(self._max_class + 1)]
+
+    def _bucket_add(self, offset, size):
+        # buckets are kept sorted by slot size, so alloc can best-fit with a bisect
+        bisect.insort(self._free_by_class.setdefault(size.bit_length(), []), (offset, size), key=_slot_size)
+
+    def _bucket_remove(self, offset, size):
+        self._free_by_class[size.bit_length()].remove((offset, size))
+
+    def _push_free_slot(self, offset, size):
+        """ inserts a free slot, merging it with adjacent free neighbors (boundary-tag coalescing, a-la
+        dlmalloc) so fragmentation doesn't grow monotonically and defrag stays a rare event. """
+        offsets, sizes = self._free_offsets, self._free_sizes
+        i = bisect.bisect_left(offsets, offset)
+        if i > 0 and offsets[i - 1] + sizes[i - 1] == offset:
+            # merge with the free slot ending right where we start:
+            i -= 1
+            left_offset, left_size = offsets[i], sizes[i]
+            del offsets[i], sizes[i]
+            self._bucket_remove(left_offset, left_size)
+            offset, size = left_offset, left_size + size
+        if i < len(offsets) and offset + size == offsets[i]:
+            # merge with the free slot starting right where we end:
+            right_offset, right_size = offsets[i], sizes[i]
+            del offsets[i], sizes[i]
+            self._bucket_remove(right_offset, right_size)
+            size += right_size
+        offsets.insert(i, offset)
+        sizes.insert(i, size)
+        self._bucket_add(offset, size)
 
-    def alloc(self, size) -> MemoryChunk:
+    def alloc(self, size, zero=False) -> MemoryChunk:
 
+        if size < 1:
+            # zero-size chunks have no offset identity: they'd share their offset with a real chunk,
+            # colliding in the offset -> chunk table and breaking the wall-to-wall run invariant
+            # defrag relies on - reject them outright
+            raise MemoryAllocationError("Allocation size must be at least 1 byte")
         if size > self._free_bytes:
             raise MemoryAllocationError("Not enough free space available")
 
-        def do_alloc():
-            for i, (slot_offset, slot_size) in enumerate(self._free_slots):
-                if size <= slot_size:
-                    res = MemoryChunk(slot_offset, size, self)
-                    if size == slot_size:
-                        self._free_slots.pop(i)
-                    else:
-                        self._free_slots[i] = (slot_offset + size, slot_size - size)
-                    self._allocated_chunks.add(res)
-                    self._free_bytes -= size
-                    self._buf[slot_offset: slot_offset + size] = bytearray(size)
-                    return res
-
-        res = do_alloc()
+        do_alloc = self._alloc_by_class[size.bit_length()]
+        res = do_alloc(size, zero)
         if res is None:
             # if got here, we need to de-frag
             self._defrag()
-            res = do_alloc()
+            res = do_alloc(size, zero)
         assert res, "INTERNAL ERROR!"
 
         return res
 
+    def _make_alloc(self, start_class):
+        """ builds the allocator specialized for one size class: the first bucket worth scanning is
+        constant-folded into the closure, so the class computation isn't repeated inside. """
+
+        def do_alloc(size, zero):
+            # recently-freed slots first (most recent first) - an exact size match here recycles a
+            # cache-hot slot without touching the buckets at all:
+            quick = self._quick_free
+            for i in range(len(quick) - 1, -1, -1):
+                if quick[i][1] == size:
+                    slot_offset = quick[i][0]
+                    del quick[i]
+                    return self._finish_alloc(slot_offset, size, zero)
+            # walk buckets from the smallest possibly-fitting size class upward, taking the smallest
+            # fitting slot (best fit - splits waste less and fragmentation grows slower). Slots in the
+            # request's own bucket might still be too small (both 5 and 7 live in bucket 3), so that one
+            # is bisected by size; in any higher bucket the first slot is the smallest fitting one.
+            for cls in range(start_class, self._max_class + 1):
+                bucket = self._free_by_class.get(cls)
+                if not bucket:
+                    continue
+                if cls == start_class:
+                    i = bisect.bisect_left(bucket, size, key=_slot_size)
+                    if i == len(bucket):
+                        continue  # every slot in our own bucket is smaller than the request
+                else:
+                    i = 0
+                slot_offset, slot_size = bucket[i]
+                del bucket[i]
+                j = bisect.bisect_left(self._free_offsets, slot_offset)
+                if size == slot_size:
+                    del self._free_offsets[j], self._free_sizes[j]
+                else:
+                    # shrink in place and re-bucket the remainder - its neighbors are
+                    # allocated (or the slot we just split), so no coalescing needed:
+                    self._free_offsets[j] = slot_offset + size
+                    self._free_sizes[j] = slot_size - size
+                    self._bucket_add(slot_offset + size, slot_size - size)
+                return self._finish_alloc(slot_offset, size, zero)
+
+        return do_alloc
+
+    def _finish_alloc(self, slot_offset, size, zero):
+        res = MemoryChunk(slot_offset, size, self)
+        self._chunk_by_offset[slot_offset] = res
+        self._free_bytes -= size
+        if zero:
+            # zeroing is opt-in: a single libc memset, no temporary bytearray
+            ctypes.memset(self._buf_addr + slot_offset, 0, size)
+        return res
+
     def read(self, chunk: MemoryChunk, start, size):
-        assert start >= 0
-        start = chunk._offset + start
         size = size or chunk._size
-
-        assert self.is_valid(chunk), "Unrecognized memory chunk!"
-        assert size <= chunk._size, "Out of memory boundaries"
-        return self._buf[start:start + size]
+        if __debug__:
+            # cheapest (plain int) checks first, validity last; python -O strips the whole block
+            assert start >= 0
+            assert size <= chunk._size, "Out of memory boundaries"
+            assert self.is_valid(chunk), "Unrecognized memory chunk!"
+        start = chunk._offset + start
+        # returns a memoryview - zero-copy; callers that need an owned copy use .tobytes().
+        # note the view aliases the buffer, so it observes later writes (and defrag moves).
+        return self._mv[start:start + size]
 
     def write(self, chunk: MemoryChunk, data: str | bytearray, start=0):
-        assert self.is_valid(chunk), "Unrecognized memory chunk!"
         if isinstance(data, str):
             data = data.encode("utf-8")
-        elif isinstance(data, bytes):
+        elif isinstance(data, (bytes, bytearray)):
             pass
         else:
             raise RuntimeError("Data must be string or bytearray!")
 
-        end = start + len(data)
-        assert end <= chunk._size, "Out of memory boundaries"
-        assert start >= 0
+        n = len(data)
+        end = start + n
+        if __debug__:
+            # cheapest (plain int) checks first, validity last; python -O strips the whole block
+            assert start >= 0
+            assert end <= chunk._size, "Out of memory boundaries"
+            assert self.is_valid(chunk), "Unrecognized memory chunk!"
 
+        if n == 0:
+            return
         buffer: bytearray = self._buf
-        buffer[chunk._offset + start: end] = data
+        offset = chunk._offset + start
+        if n <= 8:
+            # tiny writes: direct index assignment skips the slice object + buffer-protocol setup
+            for i in range(n):
+                buffer[offset + i] = data[i]
+        else:
+            buffer[offset: offset + n] = data
 
     def is_valid(self, chunk: MemoryChunk):
-        return chunk in self._allocated_chunks
+        return chunk._alive and chunk.manager is self
 
     def free(self, chunk: MemoryChunk):
-        if chunk not in self._allocated_chunks:
+        if not self.is_valid(chunk):
             raise RuntimeError("Unknown MemoryChunk!")
-        self._allocated_chunks.remove(chunk)
-        self._free_slots.append((chunk._offset, chunk._size))
+        chunk._alive = False
+        del self._chunk_by_offset[chunk._offset]
+        self._quick_free.append((chunk._offset, chunk._size))
+        if len(self._quick_free) >= self._QUICK_FREE_CAP:
+            self._flush_quick_free()
         self._free_bytes += chunk._size
 
+    def free_many(self, chunks):
+        """ frees a batch of chunks at once: one pass marks them dead, adjacent freed chunks are
+        collapsed before touching the free lists, and _free_bytes is updated once - cheaper than
+        iterated single free() calls for bulk teardown. """
+        chunks = list(chunks)
+        # validate the whole batch (including duplicates) before mutating anything, so a stale or
+        # foreign chunk mid-batch leaves the manager untouched - same contract as single free():
+        seen = set()
+        for chunk in chunks:
+            if not self.is_valid(chunk) or chunk in seen:
+                raise RuntimeError("Unknown MemoryChunk!")
+            seen.add(chunk)
+        freed = 0
+        slots = []
+        for chunk in chunks:
+            chunk._alive = False
+            del self._chunk_by_offset[chunk._offset]
+            slots.append((chunk._offset, chunk._size))
+            freed += chunk._size
+        slots.sort()
+        i = 0
+        n = len(slots)
+        while i < n:
+            offset, size = slots[i]
+            i += 1
+            while i < n and slots[i][0] == offset + size:
+                # chunks freed in this batch that touch each other merge before insertion:
+                size += slots[i][1]
+                i += 1
+            self._push_free_slot(offset, size)
+        self._free_bytes += freed
+
+    def _flush_quick_free(self):
+        quick = self._quick_free
+        self._quick_free = []
+        for offset, size in quick:
+            self._push_free_slot(offset, size)
+
     def _defrag(self):
-        """ de-frags the buffer, by simply offsetting all the used chunks to the left side, 
-        creating one consecutive allocated-chunks, starts with 0 index."""
-
-        # sorting the chunks by offset, relying on naive heuristic that if the first chunks were not freed, 
-        # we can leave them in place and spare the copying.
-        sorted_chunks: [MemoryChunk] = sorted(self._allocated_chunks, key=lambda x: x._offset)
-
-        next_offset = 0
-        for chunk in sorted_chunks:
-            if chunk._offset != next_offset:
-                # move the chunk data inside the buffer to the lowest available offset
-                self._buf[next_offset:next_offset + chunk._size] = self._buf[chunk._offset:chunk._offset + chunk._size]
-                # update the chunk pointer:
-                chunk._offset = next_offset
-            next_offset += chunk._size
-        assert next_offset == self._size - self._free_bytes, "INTERNAL ERROR"  # sanity check
-
-        # update free list:
-        self._free_slots = []
-        if self._free_bytes < self._size:
-            self._free_slots.append((next_offset, self._size - next_offset))
+        """ de-frags the buffer, by offsetting all the used chunks to the left side,
+        creating one consecutive allocated-chunks, starts with 0 index.
+
+        The copying is driven by the *free* slots rather than the allocated chunks: every gap is closed
+        by shifting the whole contiguous allocated run after it leftward with a single memmove, so data
+        before the first gap is never touched and each byte is moved at most once. When fragmentation is
+        localized (the typical case) this touches only a small tail of the buffer. """
+
+        self._flush_quick_free()  # quick-freed slots must participate in (and coalesce for) compaction
+        offsets, sizes = self._free_offsets, self._free_sizes
+        if not offsets:
+            return  # nothing to compact
+
+        n_slots = len(offsets)
+        tail_free = 0
+        if offsets[n_slots - 1] + sizes[n_slots - 1] == self._size:
+            # the last slot already sits at the buffer tail - there is no gap to close behind it,
+            # so trim it from the walk. If it was the only slot, the buffer is already compact.
+            tail_free = sizes[n_slots - 1]
+            n_slots -= 1
+            if n_slots == 0:
+                return
+
+        addr = self._buf_addr
+        chunk_by_offset = self._chunk_by_offset
+        shift = 0  # cumulative size of the gaps closed so far
+        for i in range(n_slots):
+            slot_size = sizes[i]
+            shift += slot_size
+            run_start = offsets[i] + slot_size
+            run_end = offsets[i + 1] if i + 1 < len(offsets) else self._size
+            ctypes.memmove(addr + run_start - shift, addr + run_start, run_end - run_start)
+            # allocated bytes are wall-to-wall chunks, so the run can be walked chunk-by-chunk
+            # through the offset table - no need to sort the allocated set:
+            pos = run_start
+            while pos < run_end:
+                chunk = chunk_by_offset.pop(pos)
+                chunk._offset = pos - shift
+                chunk_by_offset[chunk._offset] = chunk
+                pos += chunk._size
+        assert shift + tail_free == self._free_bytes, "INTERNAL ERROR"  # sanity check
+        next_offset = self._size - self._free_bytes
+
+        # update free lists:
+        self._free_by_class = {}
+        self._free_offsets = array('Q')
+        self._free_sizes = array('Q')
+        if next_offset < self._size:
+            self._push_free_slot(next_offset, self._size - next_offset)
 
 
 class MemoryAllocationError(Exception):
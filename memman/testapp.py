@@ -8,11 +8,11 @@ class TestApp(unittest.TestCase):
         mem = manager.alloc(10)
         # simple:
         mem.write("hello!")
-        self.assertEqual(mem.read(0, 6).decode("utf-8"), "hello!")
+        self.assertEqual(mem.read(0, 6).tobytes().decode("utf-8"), "hello!")
         # exact match:
         mem.write("1234567890")
-        self.assertEqual(mem.read(0).decode("utf-8"), "1234567890")
-        self.assertEqual(mem.read(0, 10).decode("utf-8"), "1234567890")
+        self.assertEqual(mem.read(0).tobytes().decode("utf-8"), "1234567890")
+        self.assertEqual(mem.read(0, 10).tobytes().decode("utf-8"), "1234567890")
 
         # negative tests:
         with self.assertRaises(AssertionError):
@@ -23,6 +23,8 @@ class TestApp(unittest.TestCase):
             mem.read(-2, 30)
         with self.assertRaises(MemoryAllocationError):
             manager.alloc(100)
+        with self.assertRaises(MemoryAllocationError):
+            manager.alloc(0)
 
         mem.free()
         m1 = manager.alloc(3)
@@ -31,9 +33,9 @@ class TestApp(unittest.TestCase):
         m1.write("abc")
         m2.write("xyz")
         m3.write("qwe")
-        self.assertEqual(m1.read(0, 3).decode("utf-8"), "abc")
-        self.assertEqual(m2.read(0, 3).decode("utf-8"), "xyz")
-        self.assertEqual(m3.read(0, 3).decode("utf-8"), "qwe")
+        self.assertEqual(m1.read(0, 3).tobytes().decode("utf-8"), "abc")
+        self.assertEqual(m2.read(0, 3).tobytes().decode("utf-8"), "xyz")
+        self.assertEqual(m3.read(0, 3).tobytes().decode("utf-8"), "qwe")
 
     def test_free(self):
         manager = MemoryManager(10)
@@ -45,9 +47,38 @@ class TestApp(unittest.TestCase):
         with self.assertRaises(MemoryAllocationError):
             manager.alloc(2)
         onebyte = manager.alloc(1)  # should pass
-        self.assertEqual(mem.read(0, 4).decode("utf-8"), "test")
+        self.assertEqual(mem.read(0, 4).tobytes().decode("utf-8"), "test")
         onebyte.write("X")
-        self.assertEqual(onebyte.read(0).decode("utf-8"), "X")
+        self.assertEqual(onebyte.read(0).tobytes().decode("utf-8"), "X")
+
+    def test_free_many(self):
+        manager = MemoryManager(10)
+        m1 = manager.alloc(3)
+        m2 = manager.alloc(3)
+        m3 = manager.alloc(3)
+        m2.write("xyz")
+        manager.free_many([m1, m3])
+
+        # m2 must survive the batch free:
+        self.assertEqual(m2.read(0, 3).tobytes().decode("utf-8"), "xyz")
+        with self.assertRaises(AssertionError):
+            m1.read(0)
+
+        # the freed (and coalesced) space is allocatable again:
+        mem = manager.alloc(7)
+        mem.write("7bytes!")
+        self.assertEqual(mem.read(0).tobytes().decode("utf-8"), "7bytes!")
+        self.assertEqual(m2.read(0, 3).tobytes().decode("utf-8"), "xyz")
+
+        with self.assertRaises(RuntimeError):
+            manager.free_many([m1])
+
+        # a stale chunk anywhere in the batch must leave the manager untouched:
+        with self.assertRaises(RuntimeError):
+            manager.free_many([m2, m1])
+        self.assertEqual(m2.read(0, 3).tobytes().decode("utf-8"), "xyz")
+        manager.free_many([m2, mem])
+        manager.alloc(10)  # all 10 bytes are reclaimable again
 
     def test_frag(self):
         manager = MemoryManager(10)
@@ -64,13 +95,13 @@ class TestApp(unittest.TestCase):
         mem = manager.alloc(4)  # should work and do defrag
 
         # make sure the data stays the same after defrag:
-        self.assertEqual(m1.read(0, 3).decode("utf-8"), "abc")
-        self.assertEqual(m3.read(0, 3).decode("utf-8"), "xyz")
+        self.assertEqual(m1.read(0, 3).tobytes().decode("utf-8"), "abc")
+        self.assertEqual(m3.read(0, 3).tobytes().decode("utf-8"), "xyz")
 
         mem.write("test")
-        self.assertEqual(mem.read(0, 4).decode("utf-8"), "test")
+        self.assertEqual(mem.read(0, 4).tobytes().decode("utf-8"), "test")
 
         # reuse m1:
         m1.write("ABC")
-        self.assertEqual(m1.read(0, 3).decode("utf-8"), "ABC")
+        self.assertEqual(m1.read(0, 3).tobytes().decode("utf-8"), "ABC")
 